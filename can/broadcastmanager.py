@@ -7,14 +7,77 @@ The main entry point to these classes should be through
 """
 
 import abc
+import ctypes
+import errno
+import heapq
+import itertools
 import logging
+import operator
+import os
+import sys
 import threading
 import time
+import weakref
 
 import can
 
 log = logging.getLogger("can.bcm")
 
+#: Error numbers of failed sends that are retried on the next period, they
+#: signal a full transmit queue rather than a broken bus
+TRANSIENT_ERRNOS = frozenset((errno.ENOBUFS, errno.EAGAIN))
+
+#: The maximum number of due messages the thread based cyclic tasks of a bus
+#: send while holding the send lock once, so that other threads sending on
+#: the bus are not starved
+MAX_BATCH = 8
+
+# From <linux/prctl.h>
+PR_SET_TIMERSLACK = 29
+
+
+def _is_transient_error(exc):
+    """Check `exc` and the exceptions it was raised from for an error number
+    in :data:`TRANSIENT_ERRNOS`.
+    """
+    while exc is not None:
+        if getattr(exc, "errno", None) in TRANSIENT_ERRNOS:
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+def _set_current_thread_realtime(enabled):
+    """Try to lower the wake up jitter of the calling thread, or to restore
+    the defaults.
+
+    When enabled the thread uses the ``SCHED_FIFO`` scheduling policy and its
+    timer slack is reduced from the default 50 us to 1 ns. This is only
+    supported on Linux and requires the ``CAP_SYS_NICE`` capability, failures
+    are logged and otherwise ignored.
+    """
+    if not sys.platform.startswith("linux"):
+        log.debug("Real time scheduling is only supported on Linux")
+        return
+    if enabled:
+        policy, priority, timer_slack = os.SCHED_FIFO, 10, 1
+    else:
+        # A timer slack of 0 restores the default of the thread
+        policy, priority, timer_slack = os.SCHED_OTHER, 0, 0
+    try:
+        # On Linux a pid of 0 refers to the calling thread
+        os.sched_setscheduler(0, policy, os.sched_param(priority))
+    except OSError as exc:
+        log.debug("Could not change the scheduling policy: %s", exc)
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        if libc.prctl(PR_SET_TIMERSLACK, timer_slack, 0, 0, 0) != 0:
+            log.debug(
+                "Could not change the timer slack: %s", os.strerror(ctypes.get_errno())
+            )
+    except (OSError, AttributeError) as exc:
+        log.debug("Could not change the timer slack: %s", exc)
+
 
 class CyclicTask:
     """
@@ -25,7 +88,8 @@ class CyclicTask:
     def stop(self):
         """Cancel this periodic task.
         :raises can.CanError:
-            If stop is called on an already stopped task.
+            If stop is called on an already stopped task, for backends that
+            do not ignore this. :class:`ThreadBasedCyclicSendTask` ignores it.
         """
 
 
@@ -49,26 +113,28 @@ class CyclicSendTaskABC(CyclicTask):
 
     @staticmethod
     def _check_and_convert_messages(messages):
-        if not isinstance(messages, (list, tuple)):
-            if isinstance(messages, can.Message):
-                messages = [messages]
-            else:
-                raise ValueError("Must be either a list, tuple, or a Message")
+        if isinstance(messages, can.Message):
+            return (messages,)
+        try:
+            messages = tuple(messages)
+        except TypeError:
+            raise ValueError("Must be either a list, tuple, or a Message")
         if not messages:
             raise ValueError("Must be at least a list or tuple of length 1")
-        messages = tuple(messages)
-
-        all_same_id = all(
-            message.arbitration_id == messages[0].arbitration_id for message in messages
-        )
-        if not all_same_id:
-            raise ValueError("All Arbitration IDs should be the same")
 
-        all_same_channel = all(
-            message.channel == messages[0].channel for message in messages
-        )
-        if not all_same_channel:
-            raise ValueError("All Channel IDs should be the same")
+        # attrgetter reads both attributes in C
+        get_id_and_channel = operator.attrgetter("arbitration_id", "channel")
+        if not isinstance(messages[0], can.Message):
+            raise ValueError("All elements must be Messages")
+        reference = get_id_and_channel(messages[0])
+        for message in itertools.islice(messages, 1, None):
+            if not isinstance(message, can.Message):
+                raise ValueError("All elements must be Messages")
+            id_and_channel = get_id_and_channel(message)
+            if id_and_channel != reference:
+                if id_and_channel[0] != reference[0]:
+                    raise ValueError("All Arbitration IDs should be the same")
+                raise ValueError("All Channel IDs should be the same")
 
         return messages
 
@@ -109,13 +175,31 @@ class ModifiableCyclicTaskABC(CyclicSendTaskABC):
             to the original number of messages originally specified for this
             task.
         """
-        messages = self._check_and_convert_messages(messages)
+        self.messages = self._check_modified_messages(messages)
+
+    def _check_modified_messages(self, messages):
+        """Only checks what :meth:`modify_data` may not change, the messages
+        were fully validated when the task was created.
+        """
+        if isinstance(messages, can.Message):
+            messages = (messages,)
+        else:
+            try:
+                messages = tuple(messages)
+            except TypeError:
+                raise ValueError("Must be either a list, tuple, or a Message")
         if len(self.messages) != len(messages):
             raise ValueError(
                 "The number of new cyclic messages to be sent must be equal to "
                 "the number of messages originally specified for this task"
             )
-        self.messages = messages
+        arbitration_id = self.arbitration_id
+        for message in messages:
+            if not isinstance(message, can.Message):
+                raise ValueError("All elements must be Messages")
+            if message.arbitration_id != arbitration_id:
+                raise ValueError("The Arbitration ID cannot be changed")
+        return messages
 
 
 class MultiRateCyclicSendTaskABC(CyclicSendTaskABC):
@@ -135,45 +219,288 @@ class MultiRateCyclicSendTaskABC(CyclicSendTaskABC):
         super().__init__(channel, messages, subsequent_period)
 
 
+class _CyclicScheduler:
+    """Sends the messages of all thread based cyclic tasks sharing a send lock
+    from one thread.
+
+    There is one scheduler per send lock, which is one per bus, so a bus
+    whose ``send()`` blocks does not delay the tasks of other buses.
+    Scheduled tasks are kept in a heap ordered by their next deadline. The
+    thread is started on demand and exits once no tasks are left.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._condition = threading.Condition(threading.Lock())
+        # Breaks ties between equal deadlines, tasks are not comparable
+        self._sequence = itertools.count()
+        self._thread = None
+        # The running tasks that requested real time scheduling
+        self._realtime_tasks = set()
+        # The tasks of the batch currently being sent
+        self._in_flight = set()
+
+    def add(self, task, token):
+        """Schedule `task` to be sent immediately and then every period.
+
+        :param task: The :class:`ThreadBasedCyclicSendTask` to schedule.
+        :param token:
+            Identifies this scheduling of the task, entries whose token no
+            longer matches the task's ``_schedule_token`` are dropped.
+        """
+        with self._condition:
+            task._done.clear()
+            heapq.heappush(
+                self._heap, (time.monotonic(), next(self._sequence), task, token)
+            )
+            if task.realtime:
+                self._realtime_tasks.add(task)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="Cyclic send task scheduler"
+                )
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def remove(self, task):
+        """Unschedule `task`, the thread exits right away if no tasks are
+        left.
+        """
+        with self._condition:
+            heap = self._heap
+            heap[:] = [entry for entry in heap if entry[2] is not task]
+            heapq.heapify(heap)
+            self._realtime_tasks.discard(task)
+            # Otherwise the scheduler marks the task as done after sending
+            if task not in self._in_flight:
+                task._done.set()
+            self._condition.notify()
+
+    def _finish(self, task):
+        """Mark `task` as finished by itself, must hold the condition."""
+        task._stop_event.set()
+        task._schedule_token = None
+        self._realtime_tasks.discard(task)
+        task._done.set()
+
+    def _run(self):
+        heap = self._heap
+        condition = self._condition
+        sequence = self._sequence
+        max_batch = MAX_BATCH
+        monotonic = time.monotonic
+        heappop = heapq.heappop
+        heappush = heapq.heappush
+        in_flight = self._in_flight
+        realtime = False
+        # Carried over from the end of each pass, so that there is a single
+        # clock reading per tick
+        now = monotonic()
+
+        while True:
+            with condition:
+                batch = []
+                while not batch:
+                    if not heap:
+                        self._thread = None
+                        return
+                    if bool(self._realtime_tasks) != realtime:
+                        # Scheduling parameters can only be changed reliably
+                        # from within the thread itself
+                        realtime = not realtime
+                        _set_current_thread_realtime(realtime)
+                    deadline = heap[0][0]
+                    if deadline > now:
+                        if condition.wait(deadline - now):
+                            # Woken up early by add() or remove()
+                            now = monotonic()
+                        else:
+                            # Timed out, so the head of the heap is due
+                            now = deadline
+                        continue
+                    # Take every task that is due, so the send lock below is
+                    # acquired once per batch instead of once per message
+                    while heap and heap[0][0] <= now and len(batch) < max_batch:
+                        entry = heappop(heap)
+                        task, token = entry[2], entry[3]
+                        # Skip tasks that were stopped or restarted meanwhile
+                        if task._schedule_token is token:
+                            batch.append(entry)
+                            in_flight.add(task)
+
+            sent = []
+            # All tasks of this scheduler share the send lock, it is taken
+            # from them so that the scheduler does not keep the lock alive.
+            # It prevents calling bus.send from multiple threads.
+            with batch[0][2].send_lock:
+                for entry in batch:
+                    # The task may have been stopped since it was taken
+                    sent.append(
+                        entry[2]._schedule_token is entry[3] and entry[2]._send_next()
+                    )
+
+            # A single clock reading serves the whole batch and the next pass
+            now = monotonic()
+            with condition:
+                for (next_tx, _, task, token), ok in zip(batch, sent):
+                    in_flight.discard(task)
+                    if task._schedule_token is not token:
+                        # Stopped meanwhile, or restarted and scheduled anew
+                        if task._schedule_token is None:
+                            task._done.set()
+                        continue
+                    end_time = task.end_time
+                    if not ok or (end_time is not None and now >= end_time):
+                        self._finish(task)
+                        continue
+                    # Scheduling against absolute deadlines keeps the time
+                    # spent sending from accumulating as drift. Periods missed
+                    # during a stall are skipped instead of sent back to back.
+                    next_tx = max(next_tx + task.period, now)
+                    heappush(heap, (next_tx, next(sequence), task, token))
+
+
+# Maps send locks to their scheduler, dropped together with the bus
+_schedulers = weakref.WeakKeyDictionary()
+_schedulers_lock = threading.Lock()
+
+
+def _get_scheduler(send_lock):
+    """Get the scheduler running the tasks that use `send_lock`."""
+    with _schedulers_lock:
+        scheduler = _schedulers.get(send_lock)
+        if scheduler is None:
+            scheduler = _schedulers[send_lock] = _CyclicScheduler()
+        return scheduler
+
+
+class _TaskThread:
+    """Provides the parts of :class:`threading.Thread` used to wait for a
+    :class:`ThreadBasedCyclicSendTask`, which runs on a scheduler thread
+    shared with the other tasks of its bus.
+    """
+
+    daemon = True
+
+    def __init__(self, done, name):
+        self._done = done
+        self.name = name
+
+    def is_alive(self):
+        return not self._done.is_set()
+
+    def join(self, timeout=None):
+        self._done.wait(timeout)
+
+
 class ThreadBasedCyclicSendTask(
     ModifiableCyclicTaskABC, LimitedDurationCyclicSendTaskABC, RestartableCyclicTaskABC
 ):
-    """Fallback cyclic send task using thread."""
+    """Fallback cyclic send task using thread.
 
-    def __init__(self, bus, lock, messages, period, duration=None):
+    All tasks using the same send lock, which are the tasks of one bus,
+    share a single scheduler thread. :attr:`thread` stands in for the thread
+    of this task alone, joining it waits until this task is done.
+    """
+
+    def __init__(self, bus, lock, messages, period, duration=None, realtime=False):
+        """
+        :param can.BusABC bus: The bus to send the messages on.
+        :param threading.Lock lock: Serializes calls to :meth:`can.BusABC.send`.
+        :param Union[List[can.Message], tuple(can.Message), can.Message] messages:
+            The messages to be sent periodically.
+        :param float period: The rate in seconds at which to send the messages.
+        :param float duration:
+            Approximate duration in seconds to continue sending messages. If
+            no duration is provided, the task will continue indefinitely.
+        :param bool realtime:
+            Try to run the scheduler thread with the Linux ``SCHED_FIFO``
+            policy and minimal timer slack to reduce jitter. This requires
+            the ``CAP_SYS_NICE`` capability. All thread based tasks of the
+            bus share the scheduler thread, so it applies to them as long as
+            any real time task of the bus is running.
+        """
         super().__init__(messages, period, duration)
+        self.realtime = realtime
         self.bus = bus
         self.send_lock = lock
-        self.stopped = True
-        self.thread = None
-        self.end_time = time.time() + duration if duration else None
+        self._scheduler = _get_scheduler(lock)
+        self._stop_event = threading.Event()
+        self._stop_event.set()
+        self._schedule_token = None
+        # modify_data bumps the version, the sending side compares it with
+        # the version of the messages it is currently sending
+        self._messages_version = 0
+        # Built once, so a restarted task continues with the message following
+        # the last one sent
+        self._send_next = self._make_send_next()
+        # Set while the task is neither scheduled nor being sent
+        self._done = threading.Event()
+        self._done.set()
+        self.thread = _TaskThread(
+            self._done, "Cyclic send task for 0x%X" % self.arbitration_id
+        )
+        self.end_time = time.monotonic() + duration if duration else None
         self.start()
 
     def stop(self):
-        self.stopped = True
+        """Stop sending the messages, does nothing if already stopped."""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._schedule_token = None
+        self._scheduler.remove(self)
 
     def start(self):
-        self.stopped = False
-        if self.thread is None or not self.thread.is_alive():
-            name = "Cyclic send task for 0x%X" % (self.messages[0].arbitration_id)
-            self.thread = threading.Thread(target=self._run, name=name)
-            self.thread.daemon = True
-            self.thread.start()
+        if not self._stop_event.is_set():
+            return
+        self._stop_event.clear()
+        self._schedule_token = token = object()
+        self._scheduler.add(self, token)
 
-    def _run(self):
-        msg_index = 0
-        while not self.stopped:
-            # Prevent calling bus.send from multiple threads
-            with self.send_lock:
-                started = time.time()
-                try:
-                    self.bus.send(self.messages[msg_index])
-                except Exception as exc:
+    def modify_data(self, messages):
+        super().modify_data(messages)
+        self._messages_version += 1
+
+    def _make_send_next(self):
+        """Create the function the scheduler thread calls while holding
+        :attr:`send_lock` to send the next message.
+
+        The function returns False if sending failed for good and the task
+        must be stopped. Everything it needs on every tick is bound
+        to locals of the closure once, attribute and global lookups are
+        comparatively expensive for short periods.
+        """
+        task = self
+        send = self.bus.send
+        version = self._messages_version
+        messages = self.messages
+        count = len(messages)
+        index = 0
+
+        def send_next():
+            nonlocal version, messages, count, index
+            if task._messages_version != version:
+                # Read the version before the messages, a concurrent
+                # modification then at worst reloads them once more. The
+                # index carries over, modify_data keeps the number of messages.
+                version = task._messages_version
+                messages = task.messages
+                count = len(messages)
+            try:
+                send(messages[index])
+            except Exception as exc:
+                if not _is_transient_error(exc):
                     log.exception(exc)
-                    break
-            if self.end_time is not None and time.time() >= self.end_time:
-                break
-            msg_index = (msg_index + 1) % len(self.messages)
-            # Compensate for the time it takes to send the message
-            delay = self.period - (time.time() - started)
-            time.sleep(max(0.0, delay))
\ No newline at end of file
+                    return False
+                log.debug("Transient send error, retrying on the next period: %s", exc)
+                # The index is not advanced, so the same message is retried
+                return True
+            # Cheaper than a modulo
+            index += 1
+            if index == count:
+                index = 0
+            return True
+
+        return send_next
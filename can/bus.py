@@ -144,7 +144,9 @@ class BusABC(metaclass=ABCMeta):
         """
         raise NotImplementedError("Trying to write to a readonly bus?")
 
-    def send_periodic(self, msgs, period, duration=None, store_task=True):
+    def send_periodic(
+        self, msgs, period, duration=None, store_task=True, realtime=False
+    ):
         """Start sending messages at a given period on this bus.
         The task will be active until one of the following conditions are met:
         - the (optional) duration expires
@@ -162,6 +164,11 @@ class BusABC(metaclass=ABCMeta):
         :param bool store_task:
             If True (the default) the task will be attached to this Bus instance.
             Disable to instead manage tasks manually.
+        :param bool realtime:
+            Ask for real time scheduling of the thread sending the messages,
+            see :class:`can.broadcastmanager.ThreadBasedCyclicSendTask`.
+            Interfaces that time the messages in the kernel or in hardware
+            ignore it.
         :return:
             A started task instance. Note the task can be stopped (and depending on
             the backend modified) by calling the :meth:`stop` method.
@@ -184,7 +191,12 @@ class BusABC(metaclass=ABCMeta):
                 raise ValueError("Must be either a list, tuple, or a Message")
         if not msgs:
             raise ValueError("Must be at least a list or tuple of length 1")
-        task = self._send_periodic_internal(msgs, period, duration)
+        if realtime:
+            # Only passed when requested, so that interfaces overriding
+            # _send_periodic_internal without this argument keep working
+            task = self._send_periodic_internal(msgs, period, duration, realtime=True)
+        else:
+            task = self._send_periodic_internal(msgs, period, duration)
         # we wrap the task's stop method to also remove it from the Bus's list of tasks
         original_stop_method = task.stop
 
@@ -203,7 +215,7 @@ class BusABC(metaclass=ABCMeta):
 
         return task
 
-    def _send_periodic_internal(self, msgs, period, duration=None):
+    def _send_periodic_internal(self, msgs, period, duration=None, realtime=False):
         """Default implementation of periodic message sending using threading.
         Override this method to enable a more efficient backend specific approach.
         :param Union[List[can.Message], tuple(can.Message), can.Message] msgs:
@@ -213,6 +225,8 @@ class BusABC(metaclass=ABCMeta):
         :param float duration:
             The duration between sending each message at the given rate. If
             no duration is provided, the task will continue indefinitely.
+        :param bool realtime:
+            Ask for real time scheduling of the sending thread.
         :return:
             A started task instance. Note the task can be stopped (and
             depending on the backend modified) by calling the :meth:`stop`
@@ -225,7 +239,7 @@ class BusABC(metaclass=ABCMeta):
                 threading.Lock()
             )  # pylint: disable=attribute-defined-outside-init
         task = ThreadBasedCyclicSendTask(
-            self, self._lock_send_periodic, msgs, period, duration
+            self, self._lock_send_periodic, msgs, period, duration, realtime
         )
         return task
 
@@ -681,8 +681,11 @@ class IXXATBus(BusABC):
         else:
             _canlib.canChannelPostMessage(self._channel_handle, message)
 
-    def _send_periodic_internal(self, msg, period, duration=None):
-        """Send a message using built-in cyclic transmit list functionality."""
+    def _send_periodic_internal(self, msg, period, duration=None, realtime=False):
+        """Send a message using built-in cyclic transmit list functionality.
+
+        The `realtime` argument is ignored, the hardware times the messages.
+        """
         if self._scheduler is None:
             self._scheduler = HANDLE()
             _canlib.canSchedulerOpen(self._device_handle, self.channel, self._scheduler)
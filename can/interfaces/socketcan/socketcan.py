@@ -309,12 +309,16 @@ class CyclicSendTask(
         super().__init__(messages, period, duration)
 
         self.bcm_socket = bcm_socket
-        self._tx_setup(self.messages)
-
-    def _tx_setup(self, messages):
-        # Create a low level packed frame to pass to the kernel
-        header = bytearray()
-        body = bytearray()
+        # Create a low level packed frame to pass to the kernel, the frames are
+        # kept so that restarting the task does not have to pack them again
+        self._frames = b"".join(build_can_frame(message) for message in self.messages)
+        self._tx_setup()
+
+    def _tx_setup(self):
+        """Send the TX_SETUP command with the packed frames of the current
+        messages.
+        """
+        messages = self.messages
         self.can_id_with_flags = _add_flags_to_can_id(messages[0])
         self.flags = CAN_FD_FRAME if messages[0].is_fd else 0
 
@@ -335,10 +339,8 @@ class CyclicSendTask(
             self.flags,
             nframes=len(messages),
         )
-        for message in messages:
-            body += build_can_frame(message)
         log.debug("Sending BCM command")
-        send_bcm(self.bcm_socket, header + body)
+        send_bcm(self.bcm_socket, header + self._frames)
 
     def stop(self):
         """Send a TX_DELETE message to cancel this task.
@@ -360,26 +362,19 @@ class CyclicSendTask(
         :param Union[List[can.Message], tuple(can.Message), can.Message] messages:
             The messages with the new :attr:`can.Message.data`.
         """
-        messages = self._check_and_convert_messages(messages)
-        if len(self.messages) != len(messages):
-            raise ValueError(
-                "The number of new cyclic messages to be sent must be equal to "
-                "the number of messages originally specified for this task"
-            )
+        messages = self._check_modified_messages(messages)
+        frames = b"".join(build_can_frame(message) for message in messages)
         self.messages = messages
+        self._frames = frames
 
-        header = bytearray()
-        body = bytearray()
         header = build_bcm_update_header(
             can_id=self.can_id_with_flags, msg_flags=self.flags, nframes=len(messages)
         )
-        for message in messages:
-            body += build_can_frame(message)
         log.debug("Sending BCM command")
-        send_bcm(self.bcm_socket, header + body)
+        send_bcm(self.bcm_socket, header + frames)
 
     def start(self):
-        self._tx_setup(self.messages)
+        self._tx_setup()
 
 
 class MultiRateCyclicSendTask(CyclicSendTask):
@@ -399,12 +394,8 @@ class MultiRateCyclicSendTask(CyclicSendTask):
             nframes=len(messages),
         )
 
-        body = bytearray()
-        for message in messages:
-            body += build_can_frame(message)
-
         log.info("Sending BCM TX_SETUP command")
-        send_bcm(self.bcm_socket, header + body)
+        send_bcm(self.bcm_socket, header + self._frames)
 
 
 def create_socket():
@@ -623,7 +614,7 @@ class SocketcanBus(BusABC):
             raise can.CanError("Failed to transmit: %s" % exc)
         return sent
 
-    def _send_periodic_internal(self, msgs, period, duration=None):
+    def _send_periodic_internal(self, msgs, period, duration=None, realtime=False):
         """Start sending messages at a given period on this bus.
         The kernel's Broadcast Manager SocketCAN API will be used.
         :param Union[List[can.Message], tuple(can.Message), can.Message] messages:
@@ -633,6 +624,8 @@ class SocketcanBus(BusABC):
         :param float duration:
             Approximate duration in seconds to continue sending messages. If
             no duration is provided, the task will continue indefinitely.
+        :param bool realtime:
+            Ignored, the kernel times the messages.
         :return:
             A started task instance. This can be used to modify the data,
             pause/resume the transmission and to stop the transmission.
@@ -654,7 +647,7 @@ class SocketcanBus(BusABC):
 
     def _get_bcm_socket(self, channel):
         if channel not in self._bcm_sockets:
-            self._bcm_sockets[channel] = create_bcm_socket(self.channel)
+            self._bcm_sockets[channel] = create_bcm_socket(channel)
         return self._bcm_sockets[channel]
 
     def _apply_filters(self, filters):
@@ -6,8 +6,12 @@ This module tests cyclic send tasks.
 """
 
 from time import sleep
+from unittest.mock import Mock, patch
+import errno
 import unittest
 import gc
+import threading
+import time
 
 import can
 
@@ -66,6 +70,130 @@ class SimpleCyclicSendTaskTest(unittest.TestCase, ComparingMessagesTestCase):
                 msg.channel = last_msg.channel
                 self.assertMessageEqual(msg, last_msg)
 
+    def test_check_and_convert_messages(self):
+        check = can.broadcastmanager.CyclicSendTaskABC._check_and_convert_messages
+        msg = can.Message(arbitration_id=0x123, channel="a")
+
+        self.assertEqual(check(msg), (msg,))
+        self.assertEqual(check([msg, msg]), (msg, msg))
+
+        self.assertEqual(check(iter([msg, msg])), (msg, msg))
+
+        with self.assertRaises(ValueError):
+            check([])
+        with self.assertRaises(ValueError):
+            check(0x123)
+        with self.assertRaises(ValueError):
+            check("abc")
+        with self.assertRaises(ValueError):
+            check([msg, b"\x01"])
+        with self.assertRaises(ValueError):
+            check([msg, can.Message(arbitration_id=0x321, channel="a")])
+        with self.assertRaises(ValueError):
+            check([msg, can.Message(arbitration_id=0x123, channel="b")])
+
+    def test_modify_data(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        msg = can.Message(is_extended_id=False, arbitration_id=0x123, data=[0])
+        task = bus.send_periodic(msg, 0.01)
+
+        received_msg = bus.recv(timeout=5.0)
+        assert received_msg is not None
+        assert received_msg.data == bytearray([0])
+
+        task.modify_data(
+            can.Message(is_extended_id=False, arbitration_id=0x123, data=[1])
+        )
+        # Skip any messages that were already queued before the modification
+        for _ in range(50):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            if received_msg.data == bytearray([1]):
+                break
+        else:
+            self.fail("Modified data was never sent")
+
+        with self.assertRaises(ValueError):
+            task.modify_data(can.Message(arbitration_id=0x321, data=[2]))
+        with self.assertRaises(ValueError):
+            task.modify_data([msg, msg])
+        with self.assertRaises(ValueError):
+            task.modify_data("a")
+
+        task.stop()
+        bus.shutdown()
+
+    def test_modify_data_keeps_position(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        messages = [
+            can.Message(arbitration_id=0x123, data=[index, 0]) for index in range(3)
+        ]
+        task = bus.send_periodic(messages, 0.01)
+
+        # Update a rolling counter after every message, like a checksum or alive
+        # counter would, all messages must still be sent in turn
+        received = {0: 0, 1: 0, 2: 0}
+        for counter in range(1, 61):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            received[received_msg.data[0]] += 1
+            task.modify_data(
+                [
+                    can.Message(arbitration_id=0x123, data=[index, counter])
+                    for index in range(3)
+                ]
+            )
+
+        for count in received.values():
+            assert count >= 15, "Messages were skipped: {}".format(received)
+
+        task.stop()
+        bus.shutdown()
+
+    def test_restart_continues_with_next_message(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        messages = [
+            can.Message(arbitration_id=0x123, data=[index]) for index in range(3)
+        ]
+        task = bus.send_periodic(messages, 0.02)
+        # The other task keeps the scheduler thread running while task is stopped
+        other_task = bus.send_periodic(can.Message(arbitration_id=0x321), 0.02)
+        task_thread = task.thread
+        scheduler_thread = task._scheduler._thread
+
+        last_data = None
+        while last_data is None:
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            if received_msg.arbitration_id == 0x123:
+                last_data = received_msg.data[0]
+
+        task.stop()
+        task.thread.join(5.0)
+        assert not task.thread.is_alive(), "Task didn't stop before timeout"
+
+        # Drain the queue to find the last message sent before stopping
+        received_msg = bus.recv(timeout=0)
+        while received_msg is not None:
+            if received_msg.arbitration_id == 0x123:
+                last_data = received_msg.data[0]
+            received_msg = bus.recv(timeout=0)
+
+        task.start()
+        received_msg = bus.recv(timeout=5.0)
+        while received_msg is not None and received_msg.arbitration_id != 0x123:
+            received_msg = bus.recv(timeout=5.0)
+        assert received_msg is not None
+        assert received_msg.data[0] == (last_data + 1) % 3
+
+        assert task.thread is task_thread
+        assert task._scheduler._thread is scheduler_thread
+        assert scheduler_thread.is_alive()
+
+        for each_task in (task, other_task):
+            each_task.stop()
+        bus.shutdown()
+
     def test_removing_bus_tasks(self):
         bus = can.interface.Bus(bustype="virtual")
         tasks = []
@@ -115,8 +243,280 @@ class SimpleCyclicSendTaskTest(unittest.TestCase, ComparingMessagesTestCase):
             task.stop()
 
         for task in tasks:
-            assert task.thread.join(5.0) is None, "Task didn't stop before timeout"
+            task.thread.join(5.0)
+            assert not task.thread.is_alive(), "Task didn't stop before timeout"
+
+        bus.shutdown()
+
+    def test_tasks_share_thread(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        tasks = [
+            bus.send_periodic(can.Message(arbitration_id=task_i), 0.01)
+            for task_i in range(5)
+        ]
+
+        scheduler = tasks[0]._scheduler
+        assert all(task._scheduler is scheduler for task in tasks)
+        scheduler_thread = scheduler._thread
+
+        received_ids = set()
+        for _ in range(50):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            received_ids.add(received_msg.arbitration_id)
+        assert received_ids == set(range(5))
+        assert scheduler._thread is scheduler_thread
+
+        for task in tasks:
+            task.stop()
+        scheduler_thread.join(5.0)
+        assert not scheduler_thread.is_alive(), "Tasks didn't stop before timeout"
+        bus.shutdown()
+
+    def test_join_waits_for_task_only(self):
+        bus = can.interface.Bus(bustype="virtual")
+        task = bus.send_periodic(can.Message(arbitration_id=0x123), 0.01)
+        other_task = bus.send_periodic(can.Message(arbitration_id=0x321), 0.01)
+        assert task.thread.is_alive()
+
+        # The other task keeps the scheduler thread running
+        task.stop()
+        task.thread.join(5.0)
+        assert not task.thread.is_alive(), "Task didn't stop before timeout"
+        assert other_task.thread.is_alive()
+
+        task.start()
+        assert task.thread.is_alive()
+
+        for each_task in (task, other_task):
+            each_task.stop()
+            each_task.thread.join(5.0)
+            assert not each_task.thread.is_alive(), "Task didn't stop before timeout"
+        bus.shutdown()
+
+    def test_stop_wakes_up_scheduler(self):
+        bus = can.interface.Bus(bustype="virtual")
+        task = bus.send_periodic(can.Message(arbitration_id=0x123), 3)
+        sleep(0.1)
+
+        task.stop()
+        task.thread.join(1.0)
+        assert not task.thread.is_alive(), "Stopping waited for the period"
+        bus.shutdown()
+
+    def test_no_burst_after_stall(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        original_send = bus.send
+        stalls = []
+
+        def stalling_send(msg, timeout=None):
+            if not stalls:
+                stalls.append(msg)
+                sleep(0.2)
+            original_send(msg, timeout)
+
+        bus.send = stalling_send
+        task = bus.send_periodic(can.Message(arbitration_id=0x123), 0.01)
+
+        timestamps = []
+        for _ in range(20):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            timestamps.append(received_msg.timestamp)
+        task.stop()
+        bus.shutdown()
+
+        gaps = [b - a for a, b in zip(timestamps, timestamps[1:])]
+        # Sending all 20 periods missed during the stall would leave almost
+        # no gaps. Only the message due during the stall may follow right
+        # away, plus a few messages that were themselves sent late.
+        assert sum(gap < 0.005 for gap in gaps) <= 3, gaps
+
+    def test_due_messages_are_sent_in_batches(self):
+        class CountingLock:
+            def __init__(self):
+                self.lock = threading.Lock()
+                self.sends_per_acquisition = []
+
+            def __enter__(self):
+                self.lock.acquire()
+                self.sends_per_acquisition.append(0)
+
+            def __exit__(self, *exc_info):
+                self.lock.release()
+
+        bus = can.interface.Bus(bustype="virtual")
+        send_lock = CountingLock()
+        original_send = bus.send
+
+        def counting_send(msg, timeout=None):
+            send_lock.sends_per_acquisition[-1] += 1
+            original_send(msg, timeout)
+
+        bus.send = counting_send
+        # Block the scheduler while all tasks are started, so that they are
+        # all due once it can send again
+        with send_lock.lock:
+            tasks = [
+                can.broadcastmanager.ThreadBasedCyclicSendTask(
+                    bus, send_lock, can.Message(arbitration_id=task_i), 10
+                )
+                for task_i in range(2 * can.broadcastmanager.MAX_BATCH)
+            ]
+            sleep(0.1)
+        sleep(0.1)
+        for task in tasks:
+            task.stop()
+        bus.shutdown()
+
+        # The scheduler may already have taken some tasks before the lock was
+        # released, all others are sent in as few batches as possible
+        sends = send_lock.sends_per_acquisition
+        assert sum(sends) == len(tasks), sends
+        assert max(sends) == can.broadcastmanager.MAX_BATCH, sends
+        assert len(sends) <= 3, sends
+
+    def test_clock_reads_per_send(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        original_send = bus.send
+        sent = []
+
+        def counting_send(msg, timeout=None):
+            sent.append(msg)
+            original_send(msg, timeout)
+
+        bus.send = counting_send
+        # The scheduler thread binds the clock function when it starts
+        with patch("time.monotonic", wraps=time.monotonic) as monotonic:
+            task = bus.send_periodic(can.Message(arbitration_id=0x123), 0.01)
+            for _ in range(20):
+                assert bus.recv(timeout=5.0) is not None
+            task.stop()
+            task.thread.join(5.0)
+            assert not task.thread.is_alive(), "Task didn't stop before timeout"
+
+        # One reading per send, scheduling the task and starting the thread
+        # read the clock as well
+        assert monotonic.call_count <= len(sent) + 3, (
+            monotonic.call_count,
+            len(sent),
+        )
+        bus.shutdown()
+
+    def test_blocking_bus_does_not_delay_other_buses(self):
+        slow_bus = can.interface.Bus(bustype="virtual", channel="slow")
+        bus = can.interface.Bus(
+            bustype="virtual", channel="fast", receive_own_messages=True
+        )
+        original_send = slow_bus.send
+
+        def blocking_send(msg, timeout=None):
+            sleep(0.3)
+            original_send(msg, timeout)
+
+        slow_bus.send = blocking_send
+        slow_task = slow_bus.send_periodic(can.Message(arbitration_id=1), 0.01)
+        task = bus.send_periodic(can.Message(arbitration_id=2), 0.01)
+
+        timestamps = []
+        for _ in range(50):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            timestamps.append(received_msg.timestamp)
+        max_gap = max(b - a for a, b in zip(timestamps, timestamps[1:]))
+        assert max_gap < 0.2, "Blocked for {} s by another bus".format(max_gap)
+
+        slow_task.stop()
+        task.stop()
+        slow_bus.shutdown()
+        bus.shutdown()
+
+    def test_realtime(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        task = bus.send_periodic(
+            can.Message(arbitration_id=0x123), 0.01, store_task=False, realtime=True
+        )
+        other_task = bus.send_periodic(can.Message(arbitration_id=0x321), 0.01)
+        scheduler = task._scheduler
+
+        # Whether or not the priority could be raised, messages must be sent
+        received_ids = set()
+        for _ in range(10):
+            received_msg = bus.recv(timeout=5.0)
+            assert received_msg is not None
+            received_ids.add(received_msg.arbitration_id)
+        assert received_ids == {0x123, 0x321}
+        assert scheduler._realtime_tasks == {task}
+
+        # The thread falls back to normal scheduling without real time tasks
+        task.stop()
+        assert not scheduler._realtime_tasks
+
+        other_task.stop()
+        task.thread.join(5.0)
+        assert not task.thread.is_alive(), "Task didn't stop before timeout"
+        bus.shutdown()
+
+    def test_stop_twice(self):
+        bus = can.interface.Bus(bustype="virtual")
+        task = bus.send_periodic(can.Message(arbitration_id=0x123), 0.1)
+
+        with patch.object(
+            task._scheduler, "remove", wraps=task._scheduler.remove
+        ) as remove:
+            task.stop()
+            task.stop()
+        remove.assert_called_once_with(task)
+        assert len(bus._periodic_tasks) == 0
+
+        task.start()
+        assert task.thread.is_alive()
+        task.stop()
+        bus.shutdown()
+
+    def test_transient_send_error(self):
+        bus = can.interface.Bus(bustype="virtual", receive_own_messages=True)
+        original_send = bus.send
+        failures = []
+
+        def failing_send(msg, timeout=None):
+            if len(failures) < 3:
+                failures.append(msg)
+                try:
+                    raise OSError(errno.ENOBUFS, "No buffer space available")
+                except OSError as exc:
+                    raise can.CanError("Failed to transmit: %s" % exc)
+            original_send(msg, timeout)
+
+        bus.send = failing_send
+        task = bus.send_periodic(
+            [
+                can.Message(arbitration_id=0x123, data=[0]),
+                can.Message(arbitration_id=0x123, data=[1]),
+            ],
+            0.01,
+        )
+
+        # The task keeps running after the queue was full for a few periods
+        # and retries the message that could not be sent
+        received_msg = bus.recv(timeout=5.0)
+        assert received_msg is not None
+        assert received_msg.data == bytearray([0])
+        assert [msg.data for msg in failures] == [bytearray([0])] * 3
+
+        task.stop()
+        bus.shutdown()
+
+    def test_fatal_send_error(self):
+        bus = can.interface.Bus(bustype="virtual")
+        bus.send = Mock(side_effect=can.CanError("Bus is gone"))
+        task = bus.send_periodic(can.Message(arbitration_id=0x123), 0.01)
+
+        task.thread.join(5.0)
+        assert not task.thread.is_alive(), "Task didn't stop before timeout"
+        assert bus.send.call_count == 1
 
+        task.stop()
         bus.shutdown()
 
     def test_stopping_perodic_tasks(self):
@@ -143,7 +543,8 @@ class SimpleCyclicSendTaskTest(unittest.TestCase, ComparingMessagesTestCase):
         bus.stop_all_periodic_tasks(remove_tasks=False)
 
         for task in tasks:
-            assert task.thread.join(5.0) is None, "Task didn't stop before timeout"
+            task.thread.join(5.0)
+            assert not task.thread.is_alive(), "Task didn't stop before timeout"
 
         # Tasks stopped via `stop_all_periodic_tasks` with remove_tasks=False should
         # still be associated with the bus (e.g. for restarting)
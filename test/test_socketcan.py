@@ -9,8 +9,12 @@ from unittest.mock import call
 
 import ctypes
 
+import can
 from can.interfaces.socketcan.socketcan import (
+    CyclicSendTask,
+    SocketcanBus,
     bcm_header_factory,
+    build_can_frame,
     build_bcm_header,
     build_bcm_tx_delete_header,
     build_bcm_transmit_header,
@@ -378,6 +382,56 @@ class SocketCANTest(unittest.TestCase):
         self.assertEqual(can_id, result.can_id)
         self.assertEqual(1, result.nframes)
 
+    @patch("can.interfaces.socketcan.socketcan.send_bcm")
+    def test_cyclic_send_task_sends_frames_of_current_messages(self, send_bcm):
+        def make_messages(first_byte):
+            return [
+                can.Message(
+                    arbitration_id=0x123, is_extended_id=False, data=[first_byte, index]
+                )
+                for index in range(2)
+            ]
+
+        def frames_of(messages):
+            return b"".join(build_can_frame(message) for message in messages)
+
+        messages = make_messages(0)
+        transmit_header = build_bcm_transmit_header(0x123, 0, 0, 0.1, 0, nframes=2)
+        bcm_socket = Mock()
+        task = CyclicSendTask(bcm_socket, messages, 0.1)
+        send_bcm.assert_called_once_with(
+            bcm_socket, transmit_header + frames_of(messages)
+        )
+
+        send_bcm.reset_mock()
+        new_messages = make_messages(1)
+        task.modify_data(new_messages)
+        send_bcm.assert_called_once_with(
+            bcm_socket,
+            build_bcm_update_header(0x123, 0, nframes=2) + frames_of(new_messages),
+        )
+
+        # Restarting must send the modified frames, not the original ones
+        send_bcm.reset_mock()
+        task.start()
+        send_bcm.assert_called_once_with(
+            bcm_socket, transmit_header + frames_of(new_messages)
+        )
+
+    @patch("can.interfaces.socketcan.socketcan.create_bcm_socket")
+    @patch("can.interfaces.socketcan.socketcan.bind_socket")
+    @patch("can.interfaces.socketcan.socketcan.create_socket")
+    def test_send_periodic_binds_bcm_socket_to_message_channel(
+        self, create_socket, bind_socket, create_bcm_socket
+    ):
+        bus = SocketcanBus(channel="vcan0")
+        msg = can.Message(arbitration_id=0x123, channel="vcan1")
+
+        task = bus.send_periodic(msg, 0.1, store_task=False)
+
+        create_bcm_socket.assert_called_once_with("vcan1")
+        self.assertIs(create_bcm_socket.return_value, task.bcm_socket)
+
 
 if __name__ == "__main__":
     unittest.main()